@@ -8,6 +8,7 @@ from attic.key import key_factory
 from attic.remote import cache_if_remote
 import msgpack
 import os
+import re
 import socket
 import stat
 import sys
@@ -163,11 +164,15 @@ class Archive:
         decode_dict(self.metadata, (b'name', b'hostname', b'username', b'time'))
         self.metadata[b'cmdline'] = [arg.decode('utf-8', 'surrogateescape') for arg in self.metadata[b'cmdline']]
         self.name = self.metadata[b'name']
+        self._ts = None
 
     @property
     def ts(self):
         """Timestamp of archive creation in UTC"""
-        return parse_timestamp(self.metadata[b'time'])
+        # Parsed on first use, prune and list look this up repeatedly
+        if self._ts is None:
+            self._ts = parse_timestamp(self.metadata[b'time'])
+        return self._ts
 
     def __repr__(self):
         return 'Archive(%r)' % self.name
@@ -469,6 +474,8 @@ class RobustUnpacker():
     """A restartable/robust version of the streaming msgpack unpacker
     """
     item_keys = [msgpack.packb(name) for name in ('path', 'mode', 'source', 'chunks', 'rdev', 'xattrs', 'user', 'group', 'uid', 'gid', 'mtime')]
+    # A serialized item dict starts with a fixmap followed by a fixstr key
+    item_start_re = re.compile(b'[\x80-\x8f][\xa0-\xbf]')
 
     def __init__(self, validator):
         super(RobustUnpacker, self).__init__()
@@ -493,23 +500,23 @@ class RobustUnpacker():
     def __next__(self):
         if self._resync:
             data = b''.join(self._buffered_data)
+            offset = 0
             while self._resync:
-                if not data:
+                # Skip ahead to the next position that looks like a serialized dict
+                m = self.item_start_re.search(data, offset)
+                if not m:
                     raise StopIteration
-                # Abort early if the data does not look like a serialized dict
-                if len(data) < 2 or ((data[0] & 0xf0) != 0x80) or ((data[1] & 0xe0) != 0xa0):
-                    data = data[1:]
-                    continue
+                offset = m.start()
                 # Make sure it looks like an item dict
                 for pattern in self.item_keys:
-                    if data[1:].startswith(pattern):
+                    if data.startswith(pattern, offset + 1):
                         break
                 else:
-                    data = data[1:]
+                    offset += 1
                     continue
 
                 self._unpacker = msgpack.Unpacker(object_hook=StableDict)
-                self._unpacker.feed(data)
+                self._unpacker.feed(data[offset:])
                 try:
                     item = next(self._unpacker)
                     if self.validator(item):
@@ -519,7 +526,7 @@ class RobustUnpacker():
                 # msgpack with invalid data
                 except (TypeError, ValueError, StopIteration):
                     pass
-                data = data[1:]
+                offset += 1
         else:
             return next(self._unpacker)
 
@@ -609,7 +616,7 @@ class ArchiveChecker:
         del self.chunks[Manifest.MANIFEST_ID]
 
         def mark_as_possibly_superseded(id_):
-            if self.chunks.get(id_, (0,))[0] == 0:
+            if self.chunks.get_refcount(id_) == 0:
                 self.possibly_superseded.add(id_)
 
         def add_callback(chunk):
@@ -15,7 +15,7 @@ from attic.repository import Repository
 from attic.cache import Cache
 from attic.key import key_creator
 from attic.helpers import Error, location_validator, format_time, \
-    format_file_mode, ExcludePattern, exclude_path, adjust_patterns, to_localtime, \
+    format_file_mode, ExcludePattern, PatternSet, exclude_path, adjust_patterns, to_localtime, \
     get_cache_dir, get_keys_dir, format_timedelta, prune_within, prune_split, \
     Manifest, remove_surrogates, update_excludes, format_archive, check_extension_modules, Statistics, \
     is_cachedir, bigint_to_int
@@ -116,6 +116,7 @@ Type "Yes I am sure" if you understand this and want to continue.\n""")
                 skip_inodes.add((st.st_ino, st.st_dev))
             except IOError:
                 pass
+        excludes = PatternSet(args.excludes)
         for path in args.paths:
             path = os.path.normpath(path)
             if args.dontcross:
@@ -126,7 +127,7 @@ Type "Yes I am sure" if you understand this and want to continue.\n""")
                     continue
             else:
                 restrict_dev = None
-            self._process(archive, cache, args.excludes, args.exclude_caches, skip_inodes, path, restrict_dev)
+            self._process(archive, cache, excludes, args.exclude_caches, skip_inodes, path, restrict_dev)
         archive.save()
         if args.stats:
             t = datetime.now()
@@ -275,6 +276,7 @@ Type "Yes I am sure" if you understand this and want to continue.\n""")
         if args.src.archive:
             tmap = {1: 'p', 2: 'c', 4: 'd', 6: 'b', 0o10: '-', 0o12: 'l', 0o14: 's'}
             archive = Archive(repository, key, manifest, args.src.archive)
+            now = datetime.now()
             for item in archive.iter_items():
                 type = tmap.get(item[b'mode'] // 4096, '?')
                 mode = format_file_mode(item[b'mode'])
@@ -284,7 +286,7 @@ Type "Yes I am sure" if you understand this and want to continue.\n""")
                         size = sum(size for _, size, _ in item[b'chunks'])
                     except KeyError:
                         pass
-                mtime = format_time(datetime.fromtimestamp(bigint_to_int(item[b'mtime']) / 1e9))
+                mtime = format_time(datetime.fromtimestamp(bigint_to_int(item[b'mtime']) / 1e9), now)
                 if b'source' in item:
                     if type == 'l':
                         extra = ' -> %s' % item[b'source']
@@ -8,10 +8,49 @@ import shutil
 
 from .key import PlaintextKey
 from .helpers import Error, get_cache_dir, decode_dict, st_mtime_ns, unhexlify, UpgradableLock, int_to_bigint, \
-    bigint_to_int
+    bigint_to_int, prefetch
 from .hashindex import ChunkIndex
 
 
+# sendfile(2) only supports copying between regular files on Linux
+has_sendfile = hasattr(os, 'sendfile') and sys.platform.startswith('linux')
+has_posix_fadvise = hasattr(os, 'posix_fadvise')
+
+
+def copy_file(src, dst):
+    """Copy the data and mode bits of `src` to `dst`
+
+    The data is copied by the kernel using sendfile(2) where supported.
+    """
+    if not has_sendfile:
+        return shutil.copy(src, dst)
+    with open(src, 'rb') as src_fd, open(dst, 'wb') as dst_fd:
+        os.posix_fadvise(src_fd.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+        offset = 0
+        while True:
+            count = os.sendfile(dst_fd.fileno(), src_fd.fileno(), offset, 64 * 1024 * 1024)
+            if not count:
+                break
+            offset += count
+    shutil.copymode(src, dst)
+
+
+def link_or_copy(src, dst):
+    """Replace `dst` with a hard link to `src`, or a copy of it if hard
+    links are not supported
+    """
+    if os.path.exists(dst) and os.path.samefile(src, dst):
+        return
+    tmp = dst + '.tmp'
+    if os.path.exists(tmp):
+        os.unlink(tmp)
+    try:
+        os.link(src, tmp)
+    except OSError:
+        copy_file(src, tmp)
+    os.rename(tmp, dst)
+
+
 class Cache(object):
     """Client Side cache
     """
@@ -36,6 +75,13 @@ class Cache(object):
         self.key = key
         self.manifest = manifest
         self.path = path or os.path.join(get_cache_dir(), hexlify(repository.id).decode('ascii'))
+        self._config_path = os.path.join(self.path, 'config')
+        self._chunks_path = os.path.join(self.path, 'chunks')
+        self._files_path = os.path.join(self.path, 'files')
+        self._files_tmp = os.path.join(self.path, 'files.tmp')
+        self._chunks_tmp = os.path.join(self.path, 'chunks.tmp')
+        self._txn_tmp = os.path.join(self.path, 'txn.tmp')
+        self._txn_active = os.path.join(self.path, 'txn.active')
         # Warn user before sending data to a never seen before unencrypted repository
         if not os.path.exists(self.path):
             if warn_if_unencrypted and isinstance(key, PlaintextKey):
@@ -87,15 +133,15 @@ class Cache(object):
         config.set('cache', 'version', '1')
         config.set('cache', 'repository', hexlify(self.repository.id).decode('ascii'))
         config.set('cache', 'manifest', '')
-        with open(os.path.join(self.path, 'config'), 'w') as fd:
+        with open(self._config_path, 'w') as fd:
             config.write(fd)
-        ChunkIndex().write(os.path.join(self.path, 'chunks').encode('utf-8'))
-        with open(os.path.join(self.path, 'files'), 'w') as fd:
+        ChunkIndex().write(self._chunks_path.encode('utf-8'))
+        with open(self._files_path, 'w') as fd:
             pass  # empty file
 
     def _do_open(self):
         self.config = RawConfigParser()
-        self.config.read(os.path.join(self.path, 'config'))
+        self.config.read(self._config_path)
         if self.config.getint('cache', 'version') != 1:
             raise Exception('%s Does not look like an Attic cache')
         self.id = self.config.get('cache', 'repository')
@@ -103,13 +149,13 @@ class Cache(object):
         self.timestamp = self.config.get('cache', 'timestamp', fallback=None)
         self.key_type = self.config.get('cache', 'key_type', fallback=None)
         self.previous_location = self.config.get('cache', 'previous_location', fallback=None)
-        self.chunks = ChunkIndex.read(os.path.join(self.path, 'chunks').encode('utf-8'))
+        self.chunks = ChunkIndex.read(self._chunks_path.encode('utf-8'))
         self.files = None
 
     def open(self):
         if not os.path.isdir(self.path):
             raise Exception('%s Does not look like an Attic cache' % self.path)
-        self.lock = UpgradableLock(os.path.join(self.path, 'config'), exclusive=True)
+        self.lock = UpgradableLock(self._config_path, exclusive=True)
         self.rollback()
 
     def close(self):
@@ -118,28 +164,25 @@ class Cache(object):
             self.lock = None
 
     def _read_files(self):
-        self.files = {}
         self._newest_mtime = 0
-        with open(os.path.join(self.path, 'files'), 'rb') as fd:
-            u = msgpack.Unpacker(use_list=True)
-            while True:
-                data = fd.read(64 * 1024)
-                if not data:
-                    break
-                u.feed(data)
-                for path_hash, item in u:
-                    item[0] += 1
-                    self.files[path_hash] = msgpack.packb(item)
+        with open(self._files_path, 'rb') as fd:
+            if has_posix_fadvise:
+                # The whole file is read front to back, allow more aggressive readahead
+                os.posix_fadvise(fd.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+            u = msgpack.Unpacker(fd, read_size=64 * 1024, use_list=True)
+            self.files = {path_hash: (item[0] + 1, item[1], item[2], bigint_to_int(item[3]), item[4])
+                          for path_hash, item in u}
 
     def begin_txn(self):
         # Initialize transaction snapshot
-        txn_dir = os.path.join(self.path, 'txn.tmp')
+        txn_dir = self._txn_tmp
         os.mkdir(txn_dir)
-        shutil.copy(os.path.join(self.path, 'config'), txn_dir)
-        shutil.copy(os.path.join(self.path, 'chunks'), txn_dir)
-        shutil.copy(os.path.join(self.path, 'files'), txn_dir)
-        os.rename(os.path.join(self.path, 'txn.tmp'),
-                  os.path.join(self.path, 'txn.active'))
+        shutil.copy(self._config_path, txn_dir)
+        # The chunks and files caches are never modified in place (see commit)
+        # so there is no need to copy them
+        link_or_copy(self._chunks_path, os.path.join(txn_dir, 'chunks'))
+        link_or_copy(self._files_path, os.path.join(txn_dir, 'files'))
+        os.rename(self._txn_tmp, self._txn_active)
         self.txn_active = True
 
     def commit(self):
@@ -148,75 +191,76 @@ class Cache(object):
         if not self.txn_active:
             return
         if self.files is not None:
-            with open(os.path.join(self.path, 'files'), 'wb') as fd:
+            packer = msgpack.Packer()
+            # Use a large write buffer, the files cache can contain millions of small entries
+            with open(self._files_tmp, 'wb', buffering=1024 * 1024) as fd:
                 for path_hash, item in self.files.items():
                     # Discard cached files with the newest mtime to avoid
                     # issues with filesystem snapshots and mtime precision
-                    item = msgpack.unpackb(item)
-                    if item[0] < 10 and bigint_to_int(item[3]) < self._newest_mtime:
-                        msgpack.pack((path_hash, item), fd)
+                    if item[0] < 10 and item[3] < self._newest_mtime:
+                        fd.write(packer.pack((path_hash, (item[0], item[1], item[2], int_to_bigint(item[3]), item[4]))))
+            os.rename(self._files_tmp, self._files_path)
         self.config.set('cache', 'manifest', hexlify(self.manifest.id).decode('ascii'))
         self.config.set('cache', 'timestamp', self.manifest.timestamp)
         self.config.set('cache', 'key_type', str(self.key.TYPE))
         self.config.set('cache', 'previous_location', self.repository._location.canonical_path())
-        with open(os.path.join(self.path, 'config'), 'w') as fd:
+        with open(self._config_path, 'w') as fd:
             self.config.write(fd)
-        self.chunks.write(os.path.join(self.path, 'chunks').encode('utf-8'))
-        os.rename(os.path.join(self.path, 'txn.active'),
-                  os.path.join(self.path, 'txn.tmp'))
-        shutil.rmtree(os.path.join(self.path, 'txn.tmp'))
+        self.chunks.write(self._chunks_tmp.encode('utf-8'))
+        os.rename(self._chunks_tmp, self._chunks_path)
+        os.rename(self._txn_active, self._txn_tmp)
+        shutil.rmtree(self._txn_tmp)
         self.txn_active = False
 
     def rollback(self):
         """Roll back partial and aborted transactions
         """
         # Remove partial transaction
-        if os.path.exists(os.path.join(self.path, 'txn.tmp')):
-            shutil.rmtree(os.path.join(self.path, 'txn.tmp'))
+        if os.path.exists(self._txn_tmp):
+            shutil.rmtree(self._txn_tmp)
         # Roll back active transaction
-        txn_dir = os.path.join(self.path, 'txn.active')
+        txn_dir = self._txn_active
         if os.path.exists(txn_dir):
             shutil.copy(os.path.join(txn_dir, 'config'), self.path)
-            shutil.copy(os.path.join(txn_dir, 'chunks'), self.path)
-            shutil.copy(os.path.join(txn_dir, 'files'), self.path)
-            os.rename(txn_dir, os.path.join(self.path, 'txn.tmp'))
-            if os.path.exists(os.path.join(self.path, 'txn.tmp')):
-                shutil.rmtree(os.path.join(self.path, 'txn.tmp'))
+            link_or_copy(os.path.join(txn_dir, 'chunks'), self._chunks_path)
+            link_or_copy(os.path.join(txn_dir, 'files'), self._files_path)
+            os.rename(txn_dir, self._txn_tmp)
+            if os.path.exists(self._txn_tmp):
+                shutil.rmtree(self._txn_tmp)
         self.txn_active = False
         self._do_open()
 
     def sync(self):
         """Initializes cache by fetching and reading all archive indicies
         """
-        def add(id, size, csize):
-            try:
-                count, size, csize = self.chunks[id]
-                self.chunks[id] = count + 1, size, csize
-            except KeyError:
-                self.chunks[id] = 1, size, csize
+        def fetch_and_decrypt(ids):
+            for id, chunk in zip(ids, repository.get_many(ids)):
+                yield id, self.key.decrypt(id, chunk), len(chunk)
         self.begin_txn()
         print('Initializing cache...')
         self.chunks.clear()
+        add = self.chunks.add
         unpacker = msgpack.Unpacker()
         repository = cache_if_remote(self.repository)
         for name, info in self.manifest.archives.items():
             archive_id = info[b'id']
             cdata = repository.get(archive_id)
             data = self.key.decrypt(archive_id, cdata)
-            add(archive_id, len(data), len(cdata))
+            add(archive_id, 1, len(data), len(cdata))
             archive = msgpack.unpackb(data)
             if archive[b'version'] != 1:
                 raise Exception('Unknown archive metadata version')
             decode_dict(archive, (b'name',))
             print('Analyzing archive:', archive[b'name'])
-            for key, chunk in zip(archive[b'items'], repository.get_many(archive[b'items'])):
-                data = self.key.decrypt(key, chunk)
-                add(key, len(data), len(chunk))
+            # Fetch and decrypt the item metadata in a background thread
+            # while the already available chunks are being processed
+            for key, data, csize in prefetch(fetch_and_decrypt(archive[b'items'])):
+                add(key, 1, len(data), csize)
                 unpacker.feed(data)
                 for item in unpacker:
                     if b'chunks' in item:
                         for chunk_id, size, csize in item[b'chunks']:
-                            add(chunk_id, size, csize)
+                            add(chunk_id, 1, size, csize)
 
     def add_chunk(self, id, data, stats):
         if not self.txn_active:
@@ -232,7 +276,7 @@ class Cache(object):
         return id, size, csize
 
     def seen_chunk(self, id):
-        return self.chunks.get(id, (0, 0, 0))[0]
+        return self.chunks.get_refcount(id)
 
     def chunk_incref(self, id, stats):
         if not self.txn_active:
@@ -260,17 +304,17 @@ class Cache(object):
         entry = self.files.get(path_hash)
         if not entry:
             return None
-        entry = msgpack.unpackb(entry)
-        if entry[2] == st.st_size and bigint_to_int(entry[3]) == st_mtime_ns(st) and entry[1] == st.st_ino:
+        if entry[2] == st.st_size and entry[3] == st_mtime_ns(st) and entry[1] == st.st_ino:
             # reset entry age
-            entry[0] = 0
-            self.files[path_hash] = msgpack.packb(entry)
+            self.files[path_hash] = (0,) + entry[1:]
             return entry[4]
         else:
             return None
 
     def memorize_file(self, path_hash, st, ids):
         # Entry: Age, inode, size, mtime, chunk ids
+        # The mtime is kept as a plain int in memory and only converted
+        # to its on-disk bigint form when the files cache is written
         mtime_ns = st_mtime_ns(st)
-        self.files[path_hash] = msgpack.packb((0, st.st_ino, st.st_size, int_to_bigint(mtime_ns), ids))
+        self.files[path_hash] = (0, st.st_ino, st.st_size, mtime_ns, ids)
         self._newest_mtime = max(self._newest_mtime, mtime_ns)
@@ -1,33 +1,65 @@
-from collections import defaultdict
+from collections import defaultdict, namedtuple
 import errno
 import io
 import llfuse
 import msgpack
 import os
 import stat
+import struct
 import tempfile
 import time
 from attic.archive import Archive
 from attic.helpers import daemonize
+from attic.lrucache import LRUCache
 from attic.remote import cache_if_remote
 
 # Does this version of llfuse support ns precision?
 have_fuse_mtime_ns = hasattr(llfuse.EntryAttributes, 'st_mtime_ns')
 
+if have_fuse_mtime_ns:
+    def _fill_times(entry, mtime):
+        entry.st_atime_ns = entry.st_mtime_ns = entry.st_ctime_ns = mtime
+else:
+    def _fill_times(entry, mtime):
+        entry.st_atime = entry.st_mtime = entry.st_ctime = mtime / 1e9
+
+
+# Items are stored length prefixed so they can be unpacked without
+# having to create a new streaming Unpacker for every lookup
+_item_size = struct.Struct('<I')
+
+# The subset of item metadata needed by the fuse operations
+Item = namedtuple('Item', 'mode uid gid mtime rdev nlink size chunks source xattrs')
+
+
+def make_item(item):
+    """Convert an archive item dict into an `Item`
+    """
+    chunks = item.get(b'chunks')
+    size = sum(size for _, size, _ in chunks) if chunks else 0
+    return Item(item[b'mode'], item[b'uid'], item[b'gid'], item[b'mtime'],
+                item.get(b'rdev', 0), item.get(b'nlink', 1), size, chunks,
+                item.get(b'source'), item.get(b'xattrs'))
+
 
 class ItemCache:
     def __init__(self):
         self.fd = tempfile.TemporaryFile()
         self.offset = 1000000
+        self.packer = msgpack.Packer()
 
     def add(self, item):
         pos = self.fd.seek(0, io.SEEK_END)
-        self.fd.write(msgpack.packb(item))
+        data = self.packer.pack(item)
+        # The temporary file is buffered so there is no need to join the size and data
+        self.fd.write(_item_size.pack(len(data)))
+        self.fd.write(data)
         return pos + self.offset
 
     def get(self, inode):
         self.fd.seek(inode - self.offset, io.SEEK_SET)
-        return next(msgpack.Unpacker(self.fd))
+        size, = _item_size.unpack(self.fd.read(_item_size.size))
+        return Item._make(msgpack.unpackb(self.fd.read(size)))
 
 
 class AtticOperations(llfuse.Operations):
@@ -41,9 +73,13 @@ class AtticOperations(llfuse.Operations):
         self.items = {}
         self.parent = {}
         self.contents = defaultdict(dict)
-        self.default_dir = {b'mode': 0o40755, b'mtime': int(time.time() * 1e9), b'uid': os.getuid(), b'gid': os.getgid()}
+        self.default_dir = Item(0o40755, os.getuid(), os.getgid(), int(time.time() * 1e9), 0, 1, 0, None, None, None)
         self.pending_archives = {}
         self.cache = ItemCache()
+        # Recently used items loaded from the item cache
+        self.cached_items = LRUCache(1024)
+        # Directory listings of open directories
+        self.dir_entries = {}
         if archive:
             self.process_archive(archive)
         else:
@@ -80,22 +116,23 @@ class AtticOperations(llfuse.Operations):
                     if i == num_segments:
                         if b'source' in item and stat.S_ISREG(item[b'mode']):
                             inode = self._find_inode(item[b'source'], prefix)
-                            item = self.cache.get(inode)
-                            item[b'nlink'] = item.get(b'nlink', 1) + 1
-                            self.items[inode] = item
+                            # Items of earlier hardlinks to the same file have already been updated
+                            item = self.items.get(inode) or self.cache.get(inode)
+                            self.items[inode] = item._replace(nlink=item.nlink + 1)
                         else:
-                            inode = self.cache.add(item)
+                            inode = self.cache.add(make_item(item))
                         self.parent[inode] = parent
                         if segment:
                             self.contents[parent][segment] = inode
-                    elif segment in self.contents[parent]:
-                        parent = self.contents[parent][segment]
                     else:
-                        inode = self.allocate_inode()
-                        self.items[inode] = self.default_dir
-                        self.parent[inode] = parent
-                        if segment:
-                            self.contents[parent][segment] = inode
+                        contents = self.contents[parent]
+                        inode = contents.get(segment)
+                        if inode is None:
+                            inode = self.allocate_inode()
+                            self.items[inode] = self.default_dir
+                            self.parent[inode] = parent
+                            if segment:
+                                contents[segment] = inode
                         parent = inode
 
     def allocate_inode(self):
@@ -118,7 +155,12 @@ class AtticOperations(llfuse.Operations):
         try:
             return self.items[inode]
         except KeyError:
-            return self.cache.get(inode)
+            pass
+        try:
+            return self.cached_items[inode]
+        except KeyError:
+            item = self.cached_items[inode] = self.cache.get(inode)
+            return item
 
     def _find_inode(self, path, prefix=[]):
         segments = prefix + os.fsencode(os.path.normpath(path)).split(b'/')
@@ -129,42 +171,30 @@ class AtticOperations(llfuse.Operations):
 
     def getattr(self, inode):
         item = self.get_item(inode)
-        size = 0
-        try:
-            size = sum(size for _, size, _ in item[b'chunks'])
-        except KeyError:
-            pass
         entry = llfuse.EntryAttributes()
         entry.st_ino = inode
         entry.generation = 0
         entry.entry_timeout = 300
         entry.attr_timeout = 300
-        entry.st_mode = item[b'mode']
-        entry.st_nlink = item.get(b'nlink', 1)
-        entry.st_uid = item[b'uid']
-        entry.st_gid = item[b'gid']
-        entry.st_rdev = item.get(b'rdev', 0)
-        entry.st_size = size
+        entry.st_mode = item.mode
+        entry.st_nlink = item.nlink
+        entry.st_uid = item.uid
+        entry.st_gid = item.gid
+        entry.st_rdev = item.rdev
+        entry.st_size = item.size
         entry.st_blksize = 512
         entry.st_blocks = 1
-        if have_fuse_mtime_ns:
-            entry.st_atime_ns = item[b'mtime']
-            entry.st_mtime_ns = item[b'mtime']
-            entry.st_ctime_ns = item[b'mtime']
-        else:
-            entry.st_atime = item[b'mtime'] / 1e9
-            entry.st_mtime = item[b'mtime'] / 1e9
-            entry.st_ctime = item[b'mtime'] / 1e9
+        _fill_times(entry, item.mtime)
         return entry
 
     def listxattr(self, inode):
         item = self.get_item(inode)
-        return item.get(b'xattrs', {}).keys()
+        return (item.xattrs or {}).keys()
 
     def getxattr(self, inode, name):
         item = self.get_item(inode)
         try:
-            return item.get(b'xattrs', {})[name]
+            return (item.xattrs or {})[name]
         except KeyError:
             raise llfuse.FUSEError(errno.ENODATA)
 
@@ -196,28 +226,41 @@ class AtticOperations(llfuse.Operations):
     def read(self, fh, offset, size):
         parts = []
         item = self.get_item(fh)
-        for id, s, csize in item[b'chunks']:
+        # Determine which parts of which chunks are needed first so that
+        # all chunks can be requested from the repository at once
+        wanted = []
+        for id, s, csize in item.chunks:
             if s < offset:
                 offset -= s
                 continue
             n = min(size, s - offset)
-            chunk = self.key.decrypt(id, self.repository.get(id))
-            parts.append(chunk[offset:offset+n])
+            wanted.append((id, offset, n))
             offset = 0
             size -= n
             if not size:
                 break
+        for (id, offset, n), cdata in zip(wanted, self.repository.get_many([w[0] for w in wanted])):
+            chunk = self.key.decrypt(id, cdata)
+            parts.append(chunk[offset:offset+n])
         return b''.join(parts)
 
     def readdir(self, fh, off):
-        entries = [(b'.', fh), (b'..', self.parent[fh])]
-        entries.extend(self.contents[fh].items())
-        for i, (name, inode) in enumerate(entries[off:], off):
+        # readdir is called repeatedly with increasing offsets for large
+        # directories so build the listing only once per open directory
+        entries = self.dir_entries.get(fh)
+        if entries is None:
+            entries = self.dir_entries[fh] = [(b'.', fh), (b'..', self.parent[fh])]
+            entries.extend(self.contents[fh].items())
+        for i in range(off, len(entries)):
+            name, inode = entries[i]
             yield name, self.getattr(inode), i + 1
 
+    def releasedir(self, fh):
+        self.dir_entries.pop(fh, None)
+
     def readlink(self, inode):
         item = self.get_item(inode)
-        return os.fsencode(item[b'source'])
+        return os.fsencode(item.source)
 
     def mount(self, mountpoint, extra_options, foreground=False):
         options = ['fsname=atticfs', 'ro']
@@ -166,6 +166,31 @@ cdef class ChunkIndex(IndexBase):
         data = <int *>hashindex_get(self.index, <char *>key)
         return data != NULL
 
+    def get_refcount(self, key):
+        """Return the reference count of `key`, or 0 if it is missing"""
+        assert len(key) == 32
+        data = <int *>hashindex_get(self.index, <char *>key)
+        if not data:
+            return 0
+        return _le32toh(data[0])
+
+    def add(self, key, refs, size, csize):
+        """Increase the reference count of `key` by `refs`
+
+        The entry is created with the given size and csize if missing.
+        """
+        assert len(key) == 32
+        cdef int[3] data
+        cdef int *current = <int *>hashindex_get(self.index, <char *>key)
+        if current:
+            current[0] = _htole32(_le32toh(current[0]) + refs)
+        else:
+            data[0] = _htole32(refs)
+            data[1] = _htole32(size)
+            data[2] = _htole32(csize)
+            if not hashindex_set(self.index, <char *>key, data):
+                raise Exception('hashindex_set failed')
+
     def iteritems(self, marker=None):
         cdef const void *key
         iter = ChunkKeyIterator()
@@ -4,12 +4,14 @@ import grp
 import msgpack
 import os
 import pwd
+import queue
 import re
 import sys
-import time
+import threading
 from datetime import datetime, timezone, timedelta
 from fnmatch import translate
-from operator import attrgetter
+from functools import lru_cache
+from operator import itemgetter
 import fcntl
 
 import attic.hashindex
@@ -101,7 +103,7 @@ class Manifest:
         m = msgpack.unpackb(data)
         if not m.get(b'version') == 1:
             raise ValueError('Invalid manifest version')
-        manifest.archives = dict((k.decode('utf-8'), v) for k,v in m[b'archives'].items())
+        manifest.archives = {k.decode('utf-8'): v for k, v in m[b'archives'].items()}
         manifest.timestamp = m.get(b'timestamp')
         if manifest.timestamp:
             manifest.timestamp = manifest.timestamp.decode('ascii')
@@ -138,8 +140,10 @@ def prune_split(archives, pattern, n, skip=[]):
     keep = []
     if n == 0:
         return keep
-    for a in sorted(archives, key=attrgetter('ts'), reverse=True):
-        period = to_localtime(a.ts).strftime(pattern)
+    skip = set(skip)
+    # Look up each archive timestamp only once
+    for ts, a in sorted(((a.ts, a) for a in archives), key=itemgetter(0), reverse=True):
+        period = to_localtime(ts).strftime(pattern)
         if period != last:
             last = period
             if a not in skip:
@@ -149,6 +153,8 @@ def prune_split(archives, pattern, n, skip=[]):
 
 
 class Statistics:
+    # update() is called for every chunk, slots make the attribute updates cheaper
+    __slots__ = ('osize', 'csize', 'usize', 'nfiles')
 
     def __init__(self):
         self.osize = self.csize = self.usize = self.nfiles = 0
@@ -167,6 +173,52 @@ class Statistics:
         print('All archives:   %20s %20s %20s' % (format_file_size(total_size), format_file_size(total_csize), format_file_size(unique_csize)))
 
 
+def prefetch(iterable, size=8):
+    """Iterate over `iterable` in a background thread
+
+    Up to `size` items are fetched ahead of the consumer. Exceptions raised
+    while producing items are re-raised in the consuming thread.
+    """
+    items = queue.Queue(size)
+    stop = threading.Event()
+
+    def put(value):
+        while not stop.is_set():
+            try:
+                items.put(value, timeout=.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def producer():
+        error = None
+        try:
+            for item in iterable:
+                if not put((False, item)):
+                    return
+        except BaseException as e:
+            error = e
+        finally:
+            # Always terminate the consumer, no matter how the producer stopped
+            put((True, error))
+
+    thread = threading.Thread(target=producer)
+    thread.daemon = True
+    thread.start()
+    try:
+        while True:
+            done, value = items.get()
+            if done:
+                if value is not None:
+                    raise value
+                return
+            yield value
+    finally:
+        stop.set()
+        thread.join()
+
+
 def get_keys_dir():
     """Determine where to repository keys and cache"""
     return os.environ.get('ATTIC_KEYS_DIR',
@@ -179,9 +231,12 @@ def get_cache_dir():
                           os.path.join(os.path.expanduser('~'), '.cache', 'attic'))
 
 
+_epoch = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
 def to_localtime(ts):
     """Convert datetime object from UTC to local time zone"""
-    return datetime(*time.localtime((ts - datetime(1970, 1, 1, tzinfo=timezone.utc)).total_seconds())[:6])
+    return datetime.fromtimestamp((ts - _epoch).total_seconds())
 
 
 def parse_timestamp(timestamp):
@@ -196,8 +251,9 @@ def update_excludes(args):
     """Merge exclude patterns from files with those on command line.
     Empty lines and lines starting with '#' are ignored, but whitespace
     is not stripped."""
-    if hasattr(args, 'exclude_files') and args.exclude_files:
-        if not hasattr(args, 'excludes') or args.excludes is None:
+    # Only some sub-commands support the exclude options
+    if getattr(args, 'exclude_files', None):
+        if getattr(args, 'excludes', None) is None:
             args.excludes = []
         for file in args.exclude_files:
             patterns = [line.rstrip('\r\n') for line in file if not line.startswith('#')]
@@ -207,15 +263,17 @@ def update_excludes(args):
 
 def adjust_patterns(paths, excludes):
     if paths:
-        return (excludes or []) + [IncludePattern(path) for path in paths] + [ExcludePattern('*')]
+        return PatternSet((excludes or []) + [IncludePattern(path) for path in paths] + [ExcludePattern('*')])
     else:
-        return excludes
+        return PatternSet(excludes)
 
 
 def exclude_path(path, patterns):
     """Used by create and extract sub-commands to determine
     whether or not an item should be processed.
     """
+    if isinstance(patterns, PatternSet):
+        return patterns.is_excluded(path)
     for pattern in (patterns or []):
         if pattern.match(path):
             return isinstance(pattern, ExcludePattern)
@@ -236,9 +294,11 @@ class IncludePattern:
     """
     def __init__(self, pattern):
         self.pattern = pattern.rstrip(os.path.sep)+os.path.sep
+        self.path = self.pattern[:-1]
 
     def match(self, path):
-        return (path+os.path.sep).startswith(self.pattern)
+        # Same as (path+os.path.sep).startswith(self.pattern) without creating a new string
+        return path.startswith(self.pattern) or path == self.path
 
     def __repr__(self):
         return '%s(%s)' % (type(self), self.pattern)
@@ -255,7 +315,7 @@ class ExcludePattern(IncludePattern):
             self.pattern = pattern+os.path.sep+'*'
         # fnmatch and re.match both cache compiled regular expressions.
         # Nevertheless, this is about 10 times faster.
-        self.regex = re.compile(translate(self.pattern))
+        self.regex = compile_exclude_pattern(self.pattern)
 
     def match(self, path):
         return self.regex.match(path+os.path.sep) is not None
@@ -264,6 +324,49 @@ class ExcludePattern(IncludePattern):
         return '%s(%s)' % (type(self), self.pattern)
 
 
+class PatternSet:
+    """A list of include and exclude patterns combined into a single
+    regular expression. Like with matching the patterns one by one the
+    first matching pattern determines if a path is excluded.
+    """
+    # Python < 3.5 only supports up to 100 groups per regular expression
+    max_patterns = 99 if sys.version_info < (3, 5) else None
+
+    def __init__(self, patterns):
+        self.patterns = patterns or []
+        self.regexes = []
+        if not self.patterns:
+            return
+        # Later duplicates can never match first and on some Python versions
+        # their translated regexes would redefine the same named groups
+        unique = []
+        seen = set()
+        for pattern in self.patterns:
+            if isinstance(pattern, ExcludePattern):
+                key = ('e', pattern.regex.pattern)
+            else:
+                key = ('i', re.escape(pattern.pattern))
+            if key not in seen:
+                seen.add(key)
+                unique.append(key)
+        step = self.max_patterns or len(unique)
+        for start in range(0, len(unique), step):
+            alternatives = ['(?P<%s%d>%s)' % (kind, i, regex)
+                            for i, (kind, regex) in enumerate(unique[start:start + step])]
+            self.regexes.append(re.compile('|'.join(alternatives)))
+
+    def is_excluded(self, path):
+        path += os.path.sep
+        for regex in self.regexes:
+            m = regex.match(path)
+            if m:
+                return m.lastgroup[0] == 'e'
+        return False
+
+    def __repr__(self):
+        return '%s(%r)' % (type(self), self.patterns)
+
+
 def is_cachedir(path):
     """Determines whether the specified path is a cache directory (and
     therefore should potentially be excluded from the backup) according to
@@ -284,10 +387,10 @@ def is_cachedir(path):
     return False
 
 
-def format_time(t):
+def format_time(t, now=None):
     """Format datetime suitable for fixed length list output
     """
-    if abs((datetime.now() - t).days) < 365:
+    if abs(((now or datetime.now()) - t).days) < 365:
         return t.strftime('%b %d %H:%M')
     else:
         return t.strftime('%b %d  %Y')
@@ -311,13 +414,15 @@ def format_timedelta(td):
     return txt
 
 
+# 'rwx' style permissions for every combination of three mode bits
+_mode_bits = tuple(''.join(v & m and s or '-' for m, s in ((4, 'r'), (2, 'w'), (1, 'x')))
+                   for v in range(8))
+
+
 def format_file_mode(mod):
     """Format file mode bits for list output
     """
-    def x(v):
-        return ''.join(v & m and s or '-'
-                       for m, s in ((4, 'r'), (2, 'w'), (1, 'x')))
-    return '%s%s%s' % (x(mod // 64), x(mod // 8), x(mod))
+    return _mode_bits[mod >> 6 & 7] + _mode_bits[mod >> 3 & 7] + _mode_bits[mod & 7]
 
 
 def format_file_size(v):
@@ -343,20 +448,12 @@ class IntegrityError(Error):
     """Data integrity error"""
 
 
-def memoize(function):
-    cache = {}
-
-    def decorated_function(*args):
-        try:
-            return cache[args]
-        except KeyError:
-            val = function(*args)
-            cache[args] = val
-            return val
-    return decorated_function
+@lru_cache(maxsize=None)
+def compile_exclude_pattern(pattern):
+    return re.compile(translate(pattern))
 
 
-@memoize
+@lru_cache(maxsize=None)
 def uid2user(uid, default=None):
     try:
         return pwd.getpwuid(uid).pw_name
@@ -364,7 +461,7 @@ def uid2user(uid, default=None):
         return default
 
 
-@memoize
+@lru_cache(maxsize=None)
 def user2uid(user, default=None):
     try:
         return user and pwd.getpwnam(user).pw_uid
@@ -372,7 +469,7 @@ def user2uid(user, default=None):
         return default
 
 
-@memoize
+@lru_cache(maxsize=None)
 def gid2group(gid, default=None):
     try:
         return grp.getgrgid(gid).gr_name
@@ -380,7 +477,7 @@ def gid2group(gid, default=None):
         return default
 
 
-@memoize
+@lru_cache(maxsize=None)
 def group2gid(group, default=None):
     try:
         return group and grp.getgrnam(group).gr_gid
@@ -420,29 +517,15 @@ class Location:
             raise ValueError
 
     def parse(self, text):
-        m = self.ssh_re.match(text)
-        if m:
-            self.proto = m.group('proto')
-            self.user = m.group('user')
-            self.host = m.group('host')
-            self.port = m.group('port') and int(m.group('port')) or None
-            self.path = m.group('path')
-            self.archive = m.group('archive')
-            return True
-        m = self.file_re.match(text)
-        if m:
-            self.proto = m.group('proto')
-            self.path = m.group('path')
-            self.archive = m.group('archive')
-            return True
-        m = self.scp_re.match(text)
-        if m:
-            self.user = m.group('user')
-            self.host = m.group('host')
-            self.path = m.group('path')
-            self.archive = m.group('archive')
-            self.proto = self.host and 'ssh' or 'file'
-            return True
+        for regex in (self.ssh_re, self.file_re, self.scp_re):
+            m = regex.match(text)
+            if m:
+                self.__dict__.update(m.groupdict())
+                self.port = self.port and int(self.port) or None
+                # Only the scp style syntax does not specify the protocol
+                if not self.proto:
+                    self.proto = self.host and 'ssh' or 'file'
+                return True
         return False
 
     def __str__(self):
@@ -520,7 +603,7 @@ def remove_surrogates(s, errors='replace'):
     return s.encode('utf-8', errors).decode('utf-8')
 
 
-_safe_re = re.compile(r'^((\.\.)?/+)+')
+_safe_re = re.compile(r'^(?:(?:\.\.)?/+)+')
 
 
 def make_path_safe(path):
@@ -1,40 +1,33 @@
+from collections import OrderedDict
+
+
 class LRUCache(dict):
 
     def __init__(self, capacity):
         super(LRUCache, self).__init__()
-        self._lru = []
+        self._lru = OrderedDict()
         self._capacity = capacity
 
     def __setitem__(self, key, value):
-        try:
-            self._lru.remove(key)
-        except ValueError:
-            pass
-        self._lru.append(key)
+        self._lru.pop(key, None)
+        self._lru[key] = None
         while len(self._lru) > self._capacity:
-            del self[self._lru[0]]
+            del self[next(iter(self._lru))]
         return super(LRUCache, self).__setitem__(key, value)
 
     def __getitem__(self, key):
         try:
-            self._lru.remove(key)
-            self._lru.append(key)
-        except ValueError:
+            self._lru.move_to_end(key)
+        except KeyError:
             pass
         return super(LRUCache, self).__getitem__(key)
 
     def __delitem__(self, key):
-        try:
-            self._lru.remove(key)
-        except ValueError:
-            pass
+        self._lru.pop(key, None)
         return super(LRUCache, self).__delitem__(key)
 
     def pop(self, key, default=None):
-        try:
-            self._lru.remove(key)
-        except ValueError:
-            pass
+        self._lru.pop(key, None)
         return super(LRUCache, self).pop(key, default)
 
     def _not_implemented(self, *args, **kw):
@@ -42,38 +42,43 @@ def acl_use_local_uid_gid(acl):
     return ('\n'.join(entries)).encode('ascii')
 
 
+_blank_lines_re = re.compile('\n\n+')
+_named_entry_re = re.compile('^(user|group):([^:\n]+):([^\n]*)$', re.M)
+
+
+cdef _translate_named_entries(acl, repl):
+    """Apply `repl` to every named user/group entry of a comment free acl
+    """
+    text = _named_entry_re.sub(repl, _comment_re.sub('', acl.decode('ascii')))
+    return _blank_lines_re.sub('\n', text).strip('\n').encode('ascii')
+
+
+def _append_numeric_id(m):
+    type, name, permission = m.groups()
+    if type == 'user':
+        return ':'.join([type, name, permission, str(user2uid(name, name))])
+    return ':'.join([type, name, permission, str(group2gid(name, name))])
+
+
+def _replace_with_numeric_id(m):
+    type, name, permission = m.groups()
+    if type == 'user':
+        id = str(user2uid(name, name))
+    else:
+        id = str(group2gid(name, name))
+    return ':'.join([type, id, permission, id])
+
+
 cdef acl_append_numeric_ids(acl):
     """Extend the "POSIX 1003.1e draft standard 17" format with an additional uid/gid field
     """
-    entries = []
-    for entry in _comment_re.sub('', acl.decode('ascii')).split('\n'):
-        if entry:
-            type, name, permission = entry.split(':')
-            if name and type == 'user':
-                entries.append(':'.join([type, name, permission, str(user2uid(name, name))]))
-            elif name and type == 'group':
-                entries.append(':'.join([type, name, permission, str(group2gid(name, name))]))
-            else:
-                entries.append(entry)
-    return ('\n'.join(entries)).encode('ascii')
+    return _translate_named_entries(acl, _append_numeric_id)
 
 
 cdef acl_numeric_ids(acl):
     """Replace the "POSIX 1003.1e draft standard 17" user/group field with uid/gid
     """
-    entries = []
-    for entry in _comment_re.sub('', acl.decode('ascii')).split('\n'):
-        if entry:
-            type, name, permission = entry.split(':')
-            if name and type == 'user':
-                uid = str(user2uid(name, name))
-                entries.append(':'.join([type, uid, permission, uid]))
-            elif name and type == 'group':
-                gid = str(group2gid(name, name))
-                entries.append(':'.join([type, gid, permission, gid]))
-            else:
-                entries.append(entry)
-    return ('\n'.join(entries)).encode('ascii')
+    return _translate_named_entries(acl, _replace_with_numeric_id)
 
 
 def acl_get(path, item, st, numeric_owner=False):
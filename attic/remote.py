@@ -13,6 +13,8 @@ from .helpers import Error, IntegrityError
 from .repository import Repository
 
 BUFSIZE = 10 * 1024 * 1024
+# Pending requests are joined into writes of up to this size
+MAX_WRITE = 64 * 1024
 
 
 class ConnectionClosed(Error):
@@ -179,7 +181,9 @@ class RemoteRepository(object):
                     else:
                         self.responses[msgid] = error, res
             if w:
-                while not self.to_send and (calls or self.preload_ids) and len(waiting_for) < 100:
+                # Send as many pending requests as possible with a single write
+                while len(self.to_send) < MAX_WRITE and (calls or self.preload_ids) and len(waiting_for) < 100:
+                    to_send_len = len(self.to_send)
                     if calls:
                         if is_preloaded:
                             if calls[0] in self.cache:
@@ -191,12 +195,12 @@ class RemoteRepository(object):
                             else:
                                 self.msgid += 1
                                 waiting_for.append(self.msgid)
-                                self.to_send = msgpack.packb((1, self.msgid, cmd, args))
-                    if not self.to_send and self.preload_ids:
+                                self.to_send += msgpack.packb((1, self.msgid, cmd, args))
+                    if len(self.to_send) == to_send_len and self.preload_ids:
                         args = (self.preload_ids.pop(0),)
                         self.msgid += 1
                         self.cache.setdefault(args, []).append(self.msgid)
-                        self.to_send = msgpack.packb((1, self.msgid, cmd, args))
+                        self.to_send += msgpack.packb((1, self.msgid, cmd, args))
 
                 if self.to_send:
                     try:
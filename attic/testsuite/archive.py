@@ -81,6 +81,12 @@ class RobustUnpackerTestCase(AtticTestCase):
         result = self.process(input)
         self.assert_equal(result, [{b'path': b'foo'}, {b'path': b'boo'}, {b'path': b'baz'}])
 
+    def test_large_garbage(self):
+        garbage = b'\x81\xa4' * 10000 + bytes(range(256)) * 100
+        input = [(True, [garbage, self.make_chunks([b'foo', b'bar'])])]
+        result = self.process(input)
+        self.assert_equal(result, [{b'path': b'foo'}, {b'path': b'bar'}])
+
     def test_corrupt_chunk(self):
         chunks = self.split(self.make_chunks([b'foo', b'bar', b'boo', b'baz']), 4)
         input = [(False, chunks[:3]), (True, [b'gar', b'bage'] + chunks[3:])]
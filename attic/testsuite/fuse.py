@@ -0,0 +1,120 @@
+import os
+import unittest
+import msgpack
+from attic.key import PlaintextKey
+from attic.testsuite import AtticTestCase
+
+try:
+    import llfuse
+    from attic.fuse import AtticOperations, Item, ItemCache, make_item
+    has_llfuse = True
+except ImportError:
+    has_llfuse = False
+
+
+class MockRepository:
+
+    def __init__(self):
+        self.objects = {}
+
+    def get_many(self, ids):
+        for id_ in ids:
+            yield self.objects[id_]
+
+
+class MockArchive:
+
+    def __init__(self, key, repository, items):
+        data = b''.join(msgpack.packb(item) for item in items)
+        id_ = key.id_hash(data)
+        repository.objects[id_] = key.encrypt(data)
+        self.metadata = {b'items': [id_]}
+
+
+@unittest.skipUnless(has_llfuse, 'llfuse not installed')
+class ItemCacheTestCase(AtticTestCase):
+
+    def test(self):
+        cache = ItemCache()
+        items = [
+            make_item({b'mode': 0o40755, b'uid': 1, b'gid': 2, b'mtime': 10}),
+            make_item({b'mode': 0o100644, b'uid': 1, b'gid': 2, b'mtime': 20, b'nlink': 2,
+                       b'chunks': [[b'a' * 32, 3, 2], [b'b' * 32, 4, 3]]}),
+            make_item({b'mode': 0o120777, b'uid': 1, b'gid': 2, b'mtime': 30, b'source': b'foo',
+                       b'xattrs': {b'user.foo': b'bar'}}),
+            make_item({b'mode': 0o20644, b'uid': 1, b'gid': 2, b'mtime': 40, b'rdev': 5}),
+        ]
+        inodes = [cache.add(item) for item in items]
+        self.assert_equal(len(set(inodes)), len(items))
+        for inode, item in reversed(list(zip(inodes, items))):
+            self.assert_equal(cache.get(inode), item)
+        directory, file, symlink, device = [cache.get(inode) for inode in inodes]
+        self.assert_equal(directory, Item(0o40755, 1, 2, 10, 0, 1, 0, None, None, None))
+        self.assert_equal(file.size, 7)
+        self.assert_equal(file.nlink, 2)
+        self.assert_equal(file.chunks, [[b'a' * 32, 3, 2], [b'b' * 32, 4, 3]])
+        self.assert_equal(symlink.source, b'foo')
+        self.assert_equal(symlink.xattrs, {b'user.foo': b'bar'})
+        self.assert_equal(symlink.chunks, None)
+        self.assert_equal(device.rdev, 5)
+
+
+@unittest.skipUnless(has_llfuse, 'llfuse not installed')
+class AtticOperationsTestCase(AtticTestCase):
+
+    def setUp(self):
+        self.key = PlaintextKey()
+        self.repository = MockRepository()
+        self.blobs = [os.urandom(size) for size in (10, 20, 5, 30)]
+        chunks = []
+        for blob in self.blobs:
+            id_ = self.key.id_hash(blob)
+            self.repository.objects[id_] = self.key.encrypt(blob)
+            chunks.append((id_, len(blob), len(blob)))
+        archive = MockArchive(self.key, self.repository, [
+            {b'path': b'dir', b'mode': 0o40755, b'uid': 1, b'gid': 2, b'mtime': 10},
+            {b'path': b'dir/file', b'mode': 0o100644, b'uid': 1, b'gid': 2, b'mtime': 20, b'chunks': chunks},
+            {b'path': b'dir/hardlink1', b'mode': 0o100644, b'uid': 1, b'gid': 2, b'mtime': 20, b'source': b'dir/file'},
+            {b'path': b'dir/hardlink2', b'mode': 0o100644, b'uid': 1, b'gid': 2, b'mtime': 20, b'source': b'dir/file'},
+            {b'path': b'dir/link', b'mode': 0o120777, b'uid': 1, b'gid': 2, b'mtime': 30, b'source': b'file',
+             b'xattrs': {b'user.foo': b'bar'}},
+        ])
+        self.ops = AtticOperations(self.key, self.repository, None, archive)
+
+    def lookup(self, path):
+        inode = 1
+        for segment in path.split(b'/'):
+            inode = self.ops.contents[inode][segment]
+        return inode
+
+    def test_hardlink(self):
+        inode = self.lookup(b'dir/file')
+        self.assert_equal(self.lookup(b'dir/hardlink1'), inode)
+        self.assert_equal(self.lookup(b'dir/hardlink2'), inode)
+        entry = self.ops.getattr(inode)
+        self.assert_equal(entry.st_nlink, 3)
+        self.assert_equal(entry.st_size, 65)
+        self.assert_equal(self.ops.get_item(inode).chunks, self.ops.cache.get(inode).chunks)
+
+    def test_read(self):
+        inode = self.lookup(b'dir/file')
+        data = b''.join(self.blobs)
+        for offset in range(len(data) + 1):
+            for size in (1, 7, 30, len(data)):
+                self.assert_equal(self.ops.read(inode, offset, size), data[offset:offset + size])
+
+    def test_symlink(self):
+        inode = self.lookup(b'dir/link')
+        self.assert_equal(self.ops.readlink(inode), b'file')
+        self.assert_equal(list(self.ops.listxattr(inode)), [b'user.foo'])
+        self.assert_equal(self.ops.getxattr(inode, b'user.foo'), b'bar')
+        self.assert_raises(llfuse.FUSEError, lambda: self.ops.getxattr(inode, b'user.missing'))
+        self.assert_equal(list(self.ops.listxattr(self.lookup(b'dir/file'))), [])
+
+    def test_readdir(self):
+        inode = self.lookup(b'dir')
+        names = [name for name, _, _ in self.ops.readdir(inode, 0)]
+        self.assert_equal(names, [b'.', b'..', b'file', b'hardlink1', b'hardlink2', b'link'])
+        self.assert_equal([name for name, _, _ in self.ops.readdir(inode, 4)], [b'hardlink2', b'link'])
+        self.ops.releasedir(inode)
+        self.assert_equal(self.ops.dir_entries, {})
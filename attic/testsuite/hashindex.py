@@ -66,6 +66,22 @@ class HashIndexTestCase(AtticTestCase):
         idx.write(idx_name.name)
         self.assert_equal(initial_size, os.path.getsize(idx_name.name))
 
+    def test_chunkindex_add(self):
+        idx = ChunkIndex()
+        key = bytes('%-32d' % 1, 'ascii')
+        idx.add(key, 1, 10, 5)
+        self.assert_equal(idx[key], (1, 10, 5))
+        idx.add(key, 2, 20, 15)
+        self.assert_equal(idx[key], (3, 10, 5))
+        self.assert_equal(len(idx), 1)
+
+    def test_chunkindex_get_refcount(self):
+        idx = ChunkIndex()
+        key = bytes('%-32d' % 1, 'ascii')
+        self.assert_equal(idx.get_refcount(key), 0)
+        idx[key] = 3, 10, 5
+        self.assert_equal(idx.get_refcount(key), 3)
+
     def test_iteritems(self):
         idx = NSIndex()
         for x in range(100):
@@ -4,8 +4,8 @@ from datetime import datetime, timezone, timedelta
 import os
 import tempfile
 import unittest
-from attic.helpers import adjust_patterns, exclude_path, Location, format_timedelta, IncludePattern, ExcludePattern, make_path_safe, UpgradableLock, prune_within, prune_split, to_localtime, \
-    StableDict, int_to_bigint, bigint_to_int, parse_timestamp
+from attic.helpers import adjust_patterns, exclude_path, Location, format_timedelta, IncludePattern, ExcludePattern, PatternSet, make_path_safe, UpgradableLock, prune_within, prune_split, to_localtime, \
+    StableDict, int_to_bigint, bigint_to_int, parse_timestamp, prefetch, format_file_mode
 from attic.testsuite import AtticTestCase
 import msgpack
 
@@ -103,6 +103,46 @@ class PatternTestCase(AtticTestCase):
         self.assert_equal(self.evaluate(['/etc/', '/var'], ['dmesg']),
                           ['/etc/passwd', '/etc/hosts', '/var/log/messages', '/var/log/dmesg'])
 
+    def test_pattern_set(self):
+        cases = [(['/'], ['/home/']), (['/home/'], ['/home/user2']), (['/etc/', '/var'], ['dmesg']),
+                 (['/'], ['/home/*/public_html', '*.profile', '*/log/*']), ([], ['/var/log/', '*passwd']),
+                 (['/'], ['*.profile', '/var/log/', '*.profile', '/var/log/'])]
+        for paths, excludes in cases:
+            patterns = adjust_patterns(paths, [ExcludePattern(p) for p in excludes])
+            for path in self.files:
+                self.assert_equal(exclude_path(path, patterns), exclude_path(path, patterns.patterns))
+        # Patterns split across several regular expressions still match in order
+        max_patterns = PatternSet.max_patterns
+        try:
+            PatternSet.max_patterns = 2
+            self.assert_equal(self.evaluate(['/'], ['/home/*/public_html', '*.profile', '*/log/*']),
+                              ['/etc/passwd', '/etc/hosts', '/home', '/home/user/.bashrc'])
+            self.assert_equal(self.evaluate(['/etc/', '/var'], ['dmesg']),
+                              ['/etc/passwd', '/etc/hosts', '/var/log/messages', '/var/log/dmesg'])
+            self.assert_equal(self.evaluate(['/'], ['*.profile', '*.profile', '*/log/*', '*.profile']),
+                              ['/etc/passwd', '/etc/hosts', '/home', '/home/user/.bashrc', '/home/user2/public_html/index.html'])
+        finally:
+            PatternSet.max_patterns = max_patterns
+
+    def test_empty_pattern_set(self):
+        max_patterns = PatternSet.max_patterns
+        try:
+            for PatternSet.max_patterns in (None, 2):
+                for patterns in (PatternSet(None), PatternSet([]), adjust_patterns([], None)):
+                    self.assert_equal(patterns.regexes, [])
+                    self.assert_equal([path for path in self.files if exclude_path(path, patterns)], [])
+        finally:
+            PatternSet.max_patterns = max_patterns
+
+
+class FormatFileModeTestCase(AtticTestCase):
+
+    def test(self):
+        self.assert_equal(format_file_mode(0o100644), 'rw-r--r--')
+        self.assert_equal(format_file_mode(0o40755), 'rwxr-xr-x')
+        self.assert_equal(format_file_mode(0o4751), 'rwxr-x--x')
+        self.assert_equal(format_file_mode(0), '---------')
+
 
 class MakePathSafeTestCase(AtticTestCase):
 
@@ -115,6 +155,9 @@ class MakePathSafeTestCase(AtticTestCase):
         self.assert_equal(make_path_safe('../../foo/bar'), 'foo/bar')
         self.assert_equal(make_path_safe('/'), '.')
         self.assert_equal(make_path_safe('/'), '.')
+        self.assert_equal(make_path_safe('..//../foo'), 'foo')
+        self.assert_equal(make_path_safe('./foo'), './foo')
+        self.assert_equal(make_path_safe('/' * 100000 + '../' * 10000 + 'foo'), 'foo')
 
 class UpgradableLockTestCase(AtticTestCase):
 
@@ -216,3 +259,34 @@ class TestParseTimestamp(AtticTestCase):
     def test(self):
         self.assert_equal(parse_timestamp('2015-04-19T20:25:00.226410'), datetime(2015, 4, 19, 20, 25, 0, 226410, timezone.utc))
         self.assert_equal(parse_timestamp('2015-04-19T20:25:00'), datetime(2015, 4, 19, 20, 25, 0, 0, timezone.utc))
+
+
+class PrefetchTestCase(AtticTestCase):
+
+    def test(self):
+        self.assert_equal(list(prefetch(range(100), size=3)), list(range(100)))
+        self.assert_equal(list(prefetch([])), [])
+
+    def test_exception(self):
+        def items():
+            yield 1
+            raise ValueError('foo')
+        iterator = prefetch(items())
+        self.assert_equal(next(iterator), 1)
+        self.assert_raises(ValueError, lambda: next(iterator))
+
+    def test_base_exception(self):
+        class Abort(BaseException):
+            pass
+
+        def items():
+            yield 1
+            raise Abort()
+        iterator = prefetch(items())
+        self.assert_equal(next(iterator), 1)
+        self.assert_raises(Abort, lambda: next(iterator))
+
+    def test_close(self):
+        iterator = prefetch(range(100), size=1)
+        self.assert_equal(next(iterator), 0)
+        iterator.close()
@@ -7,27 +7,23 @@ from attic.platform import acl_get, acl_set
 from attic.testsuite import AtticTestCase
 
 
-ACCESS_ACL = """
-user::rw-
-user:root:rw-:0
-user:9999:r--:9999
-group::r--
-group:root:r--:0
-group:9999:r--:9999
-mask::rw-
-other::r--
-""".strip().encode('ascii')
-
-DEFAULT_ACL = """
-user::rw-
-user:root:r--:0
-user:8888:r--:8888
-group::r--
-group:root:r--:0
-group:8888:r--:8888
-mask::rw-
-other::r--
-""".strip().encode('ascii')
+ACCESS_ACL = (b"user::rw-\n"
+              b"user:root:rw-:0\n"
+              b"user:9999:r--:9999\n"
+              b"group::r--\n"
+              b"group:root:r--:0\n"
+              b"group:9999:r--:9999\n"
+              b"mask::rw-\n"
+              b"other::r--")
+
+DEFAULT_ACL = (b"user::rw-\n"
+               b"user:root:r--:0\n"
+               b"user:8888:r--:8888\n"
+               b"group::r--\n"
+               b"group:root:r--:0\n"
+               b"group:8888:r--:8888\n"
+               b"mask::rw-\n"
+               b"other::r--")
 
 
 def fakeroot_detected():
@@ -104,6 +104,18 @@ class RepositoryTestCase(RepositoryTestCaseBase):
         self.repository.delete(b'00000000000000000000000000000000')
         self.repository.commit()
 
+    def test_no_wait(self):
+        for x in range(250):
+            self.repository.put(('%-32d' % x).encode('ascii'), b'SOMEDATA', wait=False)
+        for x in range(0, 250, 2):
+            self.repository.delete(('%-32d' % x).encode('ascii'), wait=False)
+        self.repository.put(('%-32d' % 0).encode('ascii'), b'SOMEDATA2', wait=False)
+        self.repository.commit()
+        self.assert_equal(len(self.repository), 126)
+        self.assert_equal(self.repository.get(('%-32d' % 0).encode('ascii')), b'SOMEDATA2')
+        self.assert_equal(self.repository.get(('%-32d' % 249).encode('ascii')), b'SOMEDATA')
+        self.assert_raises(Repository.ObjectNotFound, lambda: self.repository.get(('%-32d' % 248).encode('ascii')))
+
     def test_list(self):
         for x in range(100):
             self.repository.put(('%-32d' % x).encode('ascii'), b'SOMEDATA')